@@ -3,12 +3,15 @@
 - 配置 Intents 与命令前缀
 - 提供基础示例命令与启动入口
 """
+import asyncio
 import logging
+from collections import defaultdict
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 from core.config import discord_config
+from apps.discord_outbox import DiscordOutbox
 from services.rss.manager import RSSManager
 from pathlib import Path
 from urllib.parse import urlparse
@@ -34,6 +37,26 @@ async def ping(interaction: discord.Interaction):
     await interaction.response.send_message("pong")
 
 rss_manager = RSSManager()
+outbox = DiscordOutbox()
+
+
+def chunk_lines(lines: list[str], limit: int = 1900) -> list[str]:
+    """将多行文本合并为尽量少的消息，每条不超过 limit 个字符（Discord 上限为 2000）"""
+    chunks = []
+    current = []
+    size = 0
+    for line in lines:
+        line = line[:limit]
+        if current and size + 1 + len(line) > limit:
+            chunks.append("\n".join(current))
+            current = []
+            size = 0
+        size += len(line) + (1 if current else 0)
+        current.append(line)
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
 
 class RSSCommands(app_commands.Group):
     def __init__(self):
@@ -41,7 +64,7 @@ class RSSCommands(app_commands.Group):
 
     @app_commands.command(name="list", description="显示所有监控的sitemap")
     async def list(self, interaction: discord.Interaction):
-        feeds = rss_manager.get_feeds()
+        feeds = await rss_manager.get_feeds()
         if not feeds:
             await interaction.response.send_message("当前没有订阅的 sitemap")
             return
@@ -51,14 +74,16 @@ class RSSCommands(app_commands.Group):
     @app_commands.command(name="add", description="添加sitemap订阅")
     async def add(self, interaction: discord.Interaction, url: str):
         await interaction.response.defer()
-        if "sitemap" not in url.lower():
-            await interaction.followup.send("URL必须包含 sitemap 关键词，例如 https://example.com/sitemap.xml")
+        parsed_url = urlparse(url)
+        # 只检查路径与查询参数，域名中的 sitemap 不算
+        if "sitemap" not in (parsed_url.path + parsed_url.query).lower():
+            await outbox.send(interaction, content="URL必须包含 sitemap 关键词，例如 https://example.com/sitemap.xml")
             return
-        success, error_msg, dated_file, new_urls = rss_manager.add_feed(url)
-        domain = urlparse(url).netloc
+        success, error_msg, dated_file, new_urls = await rss_manager.add_feed(url)
+        domain = parsed_url.netloc
         try:
             if success:
-                await interaction.followup.send(f"成功添加订阅：{url}")
+                await outbox.send(interaction, content=f"成功添加订阅：{url}")
                 header_message = (
                     f"✨ {domain} ✨\n"
                     f"------------------------------------\n"
@@ -66,31 +91,32 @@ class RSSCommands(app_commands.Group):
                     + f"来源: {url}\n"
                 )
                 if dated_file and Path(dated_file).exists():
-                    await interaction.followup.send(content=header_message, file=discord.File(dated_file))
+                    await outbox.send(interaction, content=header_message, file=dated_file)
                     try:
                         Path(dated_file).unlink(missing_ok=True)
                     except Exception:
                         pass
                 else:
-                    await interaction.followup.send(header_message)
-                for u in new_urls:
-                    await interaction.followup.send(u)
+                    await outbox.send(interaction, content=header_message)
+                for chunk in chunk_lines(new_urls):
+                    await outbox.send(interaction, content=chunk)
                 if new_urls:
-                    await interaction.followup.send(f"✨ {domain} 更新推送完成 ✨\n------------------------------------")
+                    await outbox.send(interaction, content=f"✨ {domain} 更新推送完成 ✨\n------------------------------------")
             else:
                 if "今天已经更新过此sitemap" in error_msg:
-                    await interaction.followup.send(f"该sitemap今天已经更新过：{url}")
-                    current_file = rss_manager.sitemap_dir / domain / "sitemap-current.xml"
-                    if current_file.exists():
-                        await interaction.followup.send(content=f"今天的Sitemap文件\nURL: {url}", file=discord.File(current_file))
+                    await outbox.send(interaction, content=f"该sitemap今天已经更新过：{url}")
+                    current_file = await asyncio.to_thread(rss_manager.export_current_sitemap, url)
+                    if current_file:
+                        await outbox.send(interaction, content=f"今天的Sitemap文件\nURL: {url}", file=current_file)
+                        current_file.unlink(missing_ok=True)
                 else:
-                    await interaction.followup.send(f"添加失败：{error_msg}")
+                    await outbox.send(interaction, content=f"添加失败：{error_msg}")
         except Exception as e:
-            await interaction.followup.send(f"处理订阅时发生错误：{str(e)}")
+            await outbox.send(interaction, content=f"处理订阅时发生错误：{str(e)}")
 
     @app_commands.command(name="del", description="删除sitemap订阅")
     async def delete(self, interaction: discord.Interaction, url: str):
-        success, error_msg = rss_manager.remove_feed(url)
+        success, error_msg = await rss_manager.remove_feed(url)
         if success:
             await interaction.response.send_message(f"成功删除订阅：{url}")
         else:
@@ -99,54 +125,40 @@ class RSSCommands(app_commands.Group):
 @bot.tree.command(name="news", description="从存储的sitemap生成并发送关键词速览")
 async def news(interaction: discord.Interaction):
     await interaction.response.defer()
-    feeds = rss_manager.get_feeds()
+    feeds = await rss_manager.get_feeds()
     if not feeds:
-        await interaction.followup.send("没有配置任何 sitemap 订阅，无法生成关键词速览。")
+        await outbox.send(interaction, content="没有配置任何 sitemap 订阅，无法生成关键词速览。")
         return
-    all_new_urls = []
-    for feed_url in feeds:
-        try:
-            domain = urlparse(feed_url).netloc
-            domain_dir = rss_manager.sitemap_dir / domain
-            current_sitemap_file = domain_dir / "sitemap-current.xml"
-            latest_sitemap_file = domain_dir / "sitemap-latest.xml"
-            if current_sitemap_file.exists() and latest_sitemap_file.exists():
-                current_content = current_sitemap_file.read_text()
-                latest_content = latest_sitemap_file.read_text()
-                new_urls_for_feed = rss_manager.compare_sitemaps(current_content, latest_content)
-                all_new_urls.extend(new_urls_for_feed)
-        except Exception:
-            continue
+    # 各订阅源的读取与比较互不依赖，放到线程池中并行执行
+    results = await asyncio.gather(
+        *[asyncio.to_thread(rss_manager.get_stored_new_urls, feed_url) for feed_url in feeds],
+        return_exceptions=True,
+    )
+    all_new_urls = [u for result in results if isinstance(result, list) for u in result]
     if not all_new_urls:
-        await interaction.followup.send("所有订阅源的 current/latest 对比均无新增内容。")
+        await outbox.send(interaction, content="所有订阅源的 current/latest 对比均无新增内容。")
         return
-    from urllib.parse import urlparse as _parse
-    domain_keywords = {}
+    domain_keywords: dict[str, set[str]] = defaultdict(set)
     for url in all_new_urls:
         try:
-            parsed_url = _parse(url)
-            domain = parsed_url.netloc
-            path_parts = parsed_url.path.rstrip("/").split("/")
-            if path_parts and path_parts[-1]:
-                keyword = path_parts[-1].strip()
-                if keyword:
-                    domain_keywords.setdefault(domain, []).append(keyword)
-        except Exception:
+            parsed_url = urlparse(url)
+        except ValueError:
             continue
-    for domain in list(domain_keywords.keys()):
-        domain_keywords[domain] = list(set(domain_keywords[domain]))
+        keyword = parsed_url.path.rstrip("/").rpartition("/")[2].strip()
+        if keyword:
+            domain_keywords[parsed_url.netloc].add(keyword)
     if domain_keywords:
-        summary_message = "━━━━━━━━━━━━━━━━━━\n🎯 #今日新增 #关键词 #速览 🎯\n━━━━━━━━━━━━━━━━━━\n\n"
+        parts = ["━━━━━━━━━━━━━━━━━━\n🎯 #今日新增 #关键词 #速览 🎯\n━━━━━━━━━━━━━━━━━━\n\n"]
         for domain, keywords in domain_keywords.items():
             if keywords:
-                summary_message += f"📌 {domain}:\n"
-                for i, keyword in enumerate(keywords, 1):
-                    summary_message += f"  {i}. {keyword}\n"
-                summary_message += "\n"
-        await interaction.followup.send(summary_message)
+                parts.append(f"📌 {domain}:\n")
+                parts.extend(f"  {i}. {keyword}\n" for i, keyword in enumerate(keywords, 1))
+                parts.append("\n")
+        await outbox.send(interaction, content="".join(parts))
 
 @bot.event
 async def on_ready():
+    outbox.start()
     try:
         bot.tree.add_command(RSSCommands())
         guild_id = discord_config.get("guild_id")
@@ -178,13 +190,13 @@ async def scheduled_task():
         channel = None
     if not channel:
         return
-    from urllib.parse import urlparse as _parse
     while True:
         try:
-            feeds = rss_manager.get_feeds()
+            feeds = await rss_manager.get_feeds()
             all_new_urls = []
-            for url in feeds:
-                success, error_msg, dated_file, new_urls = rss_manager.add_feed(url)
+            # 并发检查所有订阅源，再按顺序推送结果
+            results = await rss_manager.refresh_feeds(feeds)
+            for url, (success, error_msg, dated_file, new_urls) in zip(feeds, results):
                 domain = urlparse(url).netloc
                 if success and dated_file and Path(dated_file).exists():
                     header_message = (
@@ -193,14 +205,14 @@ async def scheduled_task():
                         + (f"新增 {len(new_urls)} 条\n" if new_urls else f"{domain} 今日无更新\n")
                         + f"来源: {url}\n"
                     )
-                    await channel.send(header_message)
-                    await channel.send(file=discord.File(dated_file))
+                    await outbox.send(channel, content=header_message)
+                    await outbox.send(channel, file=dated_file)
                     try:
                         Path(dated_file).unlink(missing_ok=True)
                     except Exception:
                         pass
-                    for u in new_urls:
-                        await channel.send(u)
+                    for chunk in chunk_lines(new_urls):
+                        await outbox.send(channel, content=chunk)
                 elif "今天已经更新过此sitemap" in error_msg:
                     pass
                 else:
@@ -208,29 +220,23 @@ async def scheduled_task():
                 all_new_urls.extend(new_urls)
             await asyncio.sleep(10)
             if all_new_urls:
-                domain_keywords = {}
+                domain_keywords: dict[str, set[str]] = defaultdict(set)
                 for u in all_new_urls:
                     try:
-                        parsed_url = _parse(u)
-                        d = parsed_url.netloc
-                        parts = parsed_url.path.rstrip("/").split("/")
-                        if parts and parts[-1]:
-                            k = parts[-1].strip()
-                            if k:
-                                domain_keywords.setdefault(d, []).append(k)
-                    except Exception:
+                        parsed_url = urlparse(u)
+                    except ValueError:
                         continue
-                for d in list(domain_keywords.keys()):
-                    domain_keywords[d] = list(set(domain_keywords[d]))
+                    k = parsed_url.path.rstrip("/").rpartition("/")[2].strip()
+                    if k:
+                        domain_keywords[parsed_url.netloc].add(k)
                 if domain_keywords:
-                    summary_message = "━━━━━━━━━━━━━━━━━━\n#今日新增 #关键词 #速览\n━━━━━━━━━━━━━━━━━━\n\n"
+                    parts = ["━━━━━━━━━━━━━━━━━━\n#今日新增 #关键词 #速览\n━━━━━━━━━━━━━━━━━━\n\n"]
                     for d, keywords in domain_keywords.items():
                         if keywords:
-                            summary_message += f"{d}:\n"
-                            for i, k in enumerate(keywords, 1):
-                                summary_message += f"  {i}. {k}\n"
-                            summary_message += "\n"
-                    await channel.send(summary_message)
+                            parts.append(f"{d}:\n")
+                            parts.extend(f"  {i}. {k}\n" for i, k in enumerate(keywords, 1))
+                            parts.append("\n")
+                    await outbox.send(channel, content="".join(parts))
             await asyncio.sleep(3600)
         except Exception:
             await asyncio.sleep(60)
@@ -0,0 +1,104 @@
+"""Discord 消息发送队列
+
+- 所有发送操作进入同一个队列，由单个消费者任务依次执行
+- 同一频道两次发送之间至少间隔 interval 秒（默认 1 秒，对应频道每 5 秒 5 条的限额），避免触发频道级限流
+- discord.py 内部已对 429 与 5xx 自动重试，这里只在限流仍抛到调用方时按 retry_after 等待后重试
+- 附件以文件路径排队，每次尝试时重新构造 discord.File（发送后 discord.py 会关闭文件）
+"""
+import asyncio
+import logging
+import time
+
+import discord
+
+
+class DiscordOutbox:
+    """按频道节流的 Discord 发送队列"""
+
+    def __init__(self, interval: float = 1.0, max_retries: int = 3):
+        self.interval = interval
+        self.max_retries = max_retries
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: asyncio.Task | None = None
+        self._last_sent: dict[int | None, float] = {}
+
+    def start(self) -> None:
+        """启动消费者任务（重复调用无副作用）"""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def send(self, target: discord.abc.Messageable | discord.Interaction, **kwargs):
+        """排队发送一条消息，并等待其实际发出
+
+        Args:
+            target: 频道对象，或已 defer 的 Interaction（通过 followup 发送）
+            **kwargs: 透传给 send 的参数，如 content；file 传文件路径而非 discord.File
+
+        Returns:
+            发送成功后的 Message 对象
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((target, kwargs, future))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            target, kwargs, future = await self._queue.get()
+            try:
+                if future.cancelled():
+                    continue
+                result = await self._deliver(target, kwargs)
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, target, kwargs: dict):
+        if isinstance(target, discord.Interaction):
+            key = target.channel_id
+            send = target.followup.send
+        else:
+            key = getattr(target, "id", None)
+            send = target.send
+
+        delay = self._last_sent.get(key, 0) + self.interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        for attempt in range(self.max_retries + 1):
+            call_kwargs = dict(kwargs)
+            if kwargs.get("file") is not None:
+                call_kwargs["file"] = discord.File(kwargs["file"])
+            try:
+                return await send(**call_kwargs)
+            except (discord.RateLimited, discord.HTTPException) as e:
+                # 服务端错误已由 discord.py 重试过，且发送消息不是幂等操作，不再重复发送
+                if attempt >= self.max_retries or not self._is_rate_limited(e):
+                    raise
+                wait = self._retry_after(e) or 1.0
+                logging.warning(f"Discord 发送被限流，{wait:.1f} 秒后重试")
+                await asyncio.sleep(wait)
+            finally:
+                self._last_sent[key] = time.monotonic()
+
+    @staticmethod
+    def _is_rate_limited(exc: Exception) -> bool:
+        return isinstance(exc, discord.RateLimited) or getattr(exc, "status", None) == 429
+
+    @staticmethod
+    def _retry_after(exc: Exception) -> float | None:
+        retry_after = getattr(exc, "retry_after", None)
+        if retry_after:
+            return float(retry_after)
+        response = getattr(exc, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        for name in ("Retry-After", "X-RateLimit-Reset-After"):
+            try:
+                return float(headers.get(name))
+            except (TypeError, ValueError):
+                continue
+        return None
@@ -94,16 +94,14 @@ async def scheduled_task(token):
 
     while True:
         try:
-            feeds = rss_manager.get_feeds()
+            feeds = await rss_manager.get_feeds()
             logging.info(f"定时任务开始检查订阅源更新，共 {len(feeds)} 个订阅")
 
             # 汇总本轮所有新增 URL，用于生成关键词速览
             all_new_urls = []
-            for url in feeds:
-                logging.info(f"正在检查订阅源: {url}")
-                # add_feed 内部会调用 download_sitemap 并返回新增 URL
-                success, error_msg, dated_file, new_urls = rss_manager.add_feed(url)
-
+            # 并发检查所有订阅源（内部调用 add_feed → download_sitemap），再按顺序推送结果
+            results = await rss_manager.refresh_feeds(feeds)
+            for url, (success, error_msg, dated_file, new_urls) in zip(feeds, results):
                 if success and dated_file.exists():
                     # 推送文件与新增 URL 列表到目标频道
                     await send_update_notification(bot, url, new_urls, dated_file)
@@ -6,6 +6,7 @@
 """
 import logging
 import asyncio
+from collections import defaultdict
 from .manager import RSSManager
 from pathlib import Path
 from urllib.parse import urlparse
@@ -127,7 +128,7 @@ async def rss_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     cmd = context.args[0].lower()
     if cmd == "list":
         logging.info("执行list命令")
-        feeds = rss_manager.get_feeds()
+        feeds = await rss_manager.get_feeds()
         if not feeds:
             logging.info("RSS订阅列表为空")
             await update.message.reply_text("当前没有RSS订阅")
@@ -146,14 +147,15 @@ async def rss_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
             return
 
         url = context.args[1]
-        # 仅进行简单校验：包含 sitemap 关键词（实际可更严格）
-        if "sitemap" not in url.lower():
+        # 仅进行简单校验：路径或查询参数包含 sitemap 关键词（实际可更严格）
+        parsed_url = urlparse(url)
+        if "sitemap" not in (parsed_url.path + parsed_url.query).lower():
             logging.warning(f"无效的sitemap URL: {url} (URL需包含sitemap关键词)")
             await update.message.reply_text("URL必须以sitemap.xml结尾")
             return
 
         logging.info(f"执行add命令，URL: {url}")
-        success, error_msg, dated_file, new_urls = rss_manager.add_feed(url)
+        success, error_msg, dated_file, new_urls = await rss_manager.add_feed(url)
 
         if success:
             if "已存在的feed更新成功" in error_msg:
@@ -169,21 +171,21 @@ async def rss_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
             if "今天已经更新过此sitemap" in error_msg:
                 # 获取当前文件并发送给命令发起者（与频道通知逻辑分离）
                 try:
-                    domain = urlparse(url).netloc
-                    current_file = (
-                        rss_manager.sitemap_dir / domain / "sitemap-current.xml"
+                    current_file = await asyncio.to_thread(
+                        rss_manager.export_current_sitemap, url
                     )
-                    if current_file.exists():
+                    if current_file:
                         await context.bot.send_document(
                             chat_id=update.effective_chat.id,  # 发送给命令发起者
                             document=current_file,
                             caption=f"今天的Sitemap文件\nURL: {url}",
                         )
+                        current_file.unlink(missing_ok=True)
                         await update.message.reply_text(f"该sitemap今天已经更新过")
                         # 即使今天更新过，也尝试给频道发送一次通知（可能包含上次比较的结果）
                         # 注意：这里 dated_file 可能不存在，需要处理
                         _, _, dated_file_maybe, existing_new_urls = (
-                            rss_manager.download_sitemap(url)
+                            await rss_manager.download_sitemap(url)
                         )  # 再次调用以获取文件和URL
                         if dated_file_maybe:
                             await send_update_notification(
@@ -211,7 +213,7 @@ async def rss_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 
         url = context.args[1]
         logging.info(f"执行del命令，URL: {url}")
-        success, error_msg = rss_manager.remove_feed(url)
+        success, error_msg = await rss_manager.remove_feed(url)
         if success:
             logging.info(f"成功删除RSS订阅: {url}")
             await update.message.reply_text(f"成功删除RSS订阅：{url}")
@@ -238,7 +240,7 @@ async def force_send_keywords_summary(bot: Bot, target_chat: str = None) -> None
         return
 
     all_new_urls_for_summary = []
-    feeds = rss_manager.get_feeds()
+    feeds = await rss_manager.get_feeds()
 
     if not feeds:
         logging.info("没有配置任何 sitemap feeds，无法生成汇总。")
@@ -249,31 +251,23 @@ async def force_send_keywords_summary(bot: Bot, target_chat: str = None) -> None
         return
 
     logging.info(f"开始为 {len(feeds)} 个 feeds 强制生成关键词汇总。")
-    for feed_url in feeds:
-        try:
-            domain = urlparse(feed_url).netloc
-            domain_dir = rss_manager.sitemap_dir / domain
-            current_sitemap_file = domain_dir / "sitemap-current.xml"
-            # 'latest_sitemap_file' actually stores the sitemap content from the run *before* 'current_sitemap_file' was updated.
-            # So it's the 'old' or 'previous' sitemap.
-            latest_sitemap_file = domain_dir / "sitemap-latest.xml"
-
-            if current_sitemap_file.exists() and latest_sitemap_file.exists():
-                current_content = current_sitemap_file.read_text()
-                latest_content = latest_sitemap_file.read_text() # This is the 'old' content
-
-                # rss_manager.compare_sitemaps expects (new_content, old_content)
-                new_urls_for_feed = rss_manager.compare_sitemaps(current_content, latest_content)
-                if new_urls_for_feed:
-                    logging.info(f"强制汇总 - 为 {domain} 从 current/latest 文件比较中发现 {len(new_urls_for_feed)} 个新 URL。")
-                    all_new_urls_for_summary.extend(new_urls_for_feed)
-                else:
-                    logging.info(f"强制汇总 - 为 {domain} 从 current/latest 文件比较中未发现新 URL。")
-            else:
-                logging.warning(f"强制汇总 - 对于 {feed_url}，current ({current_sitemap_file.exists()}) 或 latest ({latest_sitemap_file.exists()}) sitemap 文件不存在，跳过比较。")
-        except Exception as e:
-            logging.error(f"强制汇总 - 处理 feed {feed_url} 时出错: {str(e)}")
-            continue
+    # 'latest' 保存的是 current 更新之前的版本，即上一次的 sitemap
+    # 各订阅源的读取与比较互不依赖，放到线程池中并行执行
+    results = await asyncio.gather(
+        *[asyncio.to_thread(rss_manager.get_stored_new_urls, feed_url) for feed_url in feeds],
+        return_exceptions=True,
+    )
+    for feed_url, new_urls_for_feed in zip(feeds, results):
+        domain = urlparse(feed_url).netloc
+        if isinstance(new_urls_for_feed, Exception):
+            logging.error(f"强制汇总 - 处理 feed {feed_url} 时出错: {str(new_urls_for_feed)}")
+        elif new_urls_for_feed is None:
+            logging.warning(f"强制汇总 - 对于 {feed_url}，current 或 latest sitemap 文件不存在，跳过比较。")
+        elif new_urls_for_feed:
+            logging.info(f"强制汇总 - 为 {domain} 从 current/latest 文件比较中发现 {len(new_urls_for_feed)} 个新 URL。")
+            all_new_urls_for_summary.extend(new_urls_for_feed)
+        else:
+            logging.info(f"强制汇总 - 为 {domain} 从 current/latest 文件比较中未发现新 URL。")
 
     if all_new_urls_for_summary:
         logging.info(f"强制汇总 - 共收集到 {len(all_new_urls_for_summary)} 个新 URL 用于生成汇总。")
@@ -329,47 +323,38 @@ async def send_keywords_summary(
     if not all_new_urls:
         return
 
-    # 创建 域名 -> 关键词 列表映射
-    domain_keywords = {}
+    # 创建 域名 -> 关键词 集合映射，集合天然去重
+    domain_keywords: dict[str, set[str]] = defaultdict(set)
 
     # 从 URL 中提取域名与末级路径作为关键词
     for url in all_new_urls:
         try:
             # 解析URL获取域名和路径
             parsed_url = urlparse(url)
-            domain = parsed_url.netloc
-
-            # 提取路径最后部分作为关键词
-            path_parts = parsed_url.path.rstrip("/").split("/")
-            if path_parts and path_parts[-1]:  # 确保有路径且最后部分不为空
-                keyword = path_parts[-1]
-                if keyword.strip():
-                    # 将关键词添加到对应域名的列表中
-                    if domain not in domain_keywords:
-                        domain_keywords[domain] = []
-                    domain_keywords[domain].append(keyword)
-        except Exception as e:
+        except ValueError as e:
             logging.debug(f"从URL提取关键词失败: {url}, 错误: {str(e)}")
             continue
 
-    # 对每个域名的关键词列表去重
-    for domain in domain_keywords:
-        domain_keywords[domain] = list(set(domain_keywords[domain]))
+        # 提取路径最后部分作为关键词
+        keyword = parsed_url.path.rstrip("/").rpartition("/")[2]
+        if keyword.strip():
+            domain_keywords[parsed_url.netloc].add(keyword)
 
     # 如果有关键词，构建并发送消息
     if domain_keywords:
         # 构建今日新增关键词消息，按域名分组
-        summary_message = (
+        # 先收集片段再一次性拼接，避免循环中反复 += 字符串
+        parts = [
             "━━━━━━━━━━━━━━━━━━\n" "🎯 #今日新增 #关键词 #速览 🎯\n" "━━━━━━━━━━━━━━━━━━\n\n"
-        )
+        ]
 
         # 按域名分组展示关键词
         for domain, keywords in domain_keywords.items():
             if keywords:  # 确保该域名有关键词
-                summary_message += f"📌 {domain}:\n"
-                for i, keyword in enumerate(keywords, 1):
-                    summary_message += f"  {i}. {keyword}\n"
-                summary_message += "\n"  # 域名之间添加空行分隔
+                parts.append(f"📌 {domain}:\n")
+                parts.extend(f"  {i}. {keyword}\n" for i, keyword in enumerate(keywords, 1))
+                parts.append("\n")  # 域名之间添加空行分隔
+        summary_message = "".join(parts)
 
         # 发送汇总消息
         try:
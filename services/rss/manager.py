@@ -1,26 +1,59 @@
 """RSS/Sitemap 管理器
 
 - 负责持久化订阅源列表与创建目录结构
-- 下载并保存每日 sitemap，维护 current/latest 两份版本
+- 下载并保存每日 sitemap，维护 current/latest 两份版本（排序后的 URL 列表，每行一个）
 - 比较新旧 sitemap 差异，返回新增 URL 列表
 """
-import json
+import asyncio
+import hashlib
 import logging
+import os
+import shutil
 from pathlib import Path
 from datetime import datetime
 from urllib.parse import urlparse
-import requests
-import gzip
+from collections import defaultdict
+import aiohttp
+import orjson
+import zlib
 from io import BytesIO
-from typing import Set
+from lxml import etree
+from typing import Iterable, Iterator, Set
+from xml.sax.saxutils import escape
+
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+GZIP_MAGIC = b"\x1f\x8b"
+STREAM_CHUNK_SIZE = 64 * 1024  # 边下载边解析时每次读取的字节数
+# 预先构造需匹配的标签名，兼容带命名空间与不带命名空间的写法
+LOC_TAGS = (f"{{{SITEMAP_NS}}}loc", "loc")
+SITEMAP_TAGS = frozenset({f"{{{SITEMAP_NS}}}sitemap", "sitemap"})
+MAX_SITEMAP_DEPTH = 4  # sitemapindex 子 sitemap 的最大递归层数
+MAX_CHILD_SITEMAPS = 256  # 单个订阅源最多抓取的子 sitemap 数量
+CHILD_FETCH_CONCURRENCY = 8  # 同时进行的子 sitemap 请求数上限
+FEED_CHECK_CONCURRENCY = 8  # 定时任务中同时检查的订阅源数量上限
 
 
 class RSSManager:
     """封装对 RSS/Sitemap 的增删查与下载、比较逻辑"""
+
+    # Discord 与 Telegram 各持有一个 RSSManager，HTTP 会话在类上共享以复用连接
+    _session: aiohttp.ClientSession | None = None
+    # 同一域名共用存储目录，两个机器人的下载需按域名串行，避免文件轮换互相覆盖
+    _domain_locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+    # 订阅列表的读-改-写之间可能有 await，需串行执行，避免并发修改互相覆盖
+    _feeds_lock = asyncio.Lock()
+
     def __init__(self):
         self.config_dir = Path("storage/rss/config")
         self.sitemap_dir = Path("storage/rss/sitemaps")  # 存储 sitemap 的基础目录
         self.feeds_file = self.config_dir / "feeds.json"
+        # 订阅列表的内存副本，仅在文件修改时间变化时重新读取
+        self._feeds_cache: list[str] = []
+        self._feeds_mtime = 0
+        # 已保存的 sitemap 文件 -> (修改时间, URL 集合)，文件未变时跳过读取与解析
+        self._file_urls: dict[Path, tuple[int, frozenset[str]]] = {}
+        # 限制同时进行的子 sitemap 请求数
+        self._fetch_semaphore = asyncio.Semaphore(CHILD_FETCH_CONCURRENCY)
         self._init_directories()
 
     def _init_directories(self):
@@ -31,7 +64,51 @@ class RSSManager:
         if not self.feeds_file.exists():
             self.feeds_file.write_text("[]")
 
-    def download_sitemap(self, url: str) -> tuple[bool, str, Path | None, list[str]]:
+        for domain_dir in self.sitemap_dir.iterdir():
+            if domain_dir.is_dir():
+                self._migrate_legacy_files(domain_dir)
+
+    def _migrate_legacy_files(self, domain_dir: Path) -> None:
+        """将旧版保存的 sitemap-current/latest.xml 转换为 URL 列表文件"""
+        for name in ("current", "latest"):
+            legacy_file = domain_dir / f"sitemap-{name}.xml"
+            if not legacy_file.exists():
+                continue
+            urls_file = domain_dir / f"sitemap-{name}.urls"
+            if not urls_file.exists():
+                self._write_urls(urls_file, self._extract_all_urls(legacy_file.read_bytes()))
+            legacy_file.unlink()
+
+    @classmethod
+    def _get_session(cls) -> aiohttp.ClientSession:
+        """获取共享的 HTTP 会话（需在事件循环内调用，首次使用时创建）
+
+        创建过程中没有 await，同一事件循环内不会并发创建多个会话
+        """
+        if cls._session is None or cls._session.closed:
+            cls._session = aiohttp.ClientSession(
+                headers={
+                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+                },
+                # 与 requests 的 timeout=20 一致：分别限制建立连接与每次读取，不限制整体耗时，大文件可持续下载
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=20, sock_read=20),
+                # 保持长连接并缓存 DNS，同一站点的子 sitemap 复用已建立的 TCP/TLS 连接
+                connector=aiohttp.TCPConnector(
+                    limit_per_host=8,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=60,
+                ),
+            )
+        return cls._session
+
+    @classmethod
+    async def close(cls) -> None:
+        """关闭共享的 HTTP 会话（程序退出时调用）"""
+        if cls._session is not None and not cls._session.closed:
+            await cls._session.close()
+        cls._session = None
+
+    async def download_sitemap(self, url: str) -> tuple[bool, str, Path | None, list[str]]:
         """下载并保存 sitemap 文件
 
         Args:
@@ -40,6 +117,10 @@ class RSSManager:
         Returns:
             tuple[bool, str, Path | None, list[str]]: (是否成功, 错误信息, 带日期的文件路径, 新增的 URL 列表)
         """
+        async with self._domain_locks[urlparse(url).netloc]:
+            return await self._download_sitemap(url)
+
+    async def _download_sitemap(self, url: str) -> tuple[bool, str, Path | None, list[str]]:
         try:
             # 以域名分目录存放相关文件
             logging.info(f"尝试下载sitemap: {url}")
@@ -55,15 +136,14 @@ class RSSManager:
             today = datetime.now().strftime("%Y%m%d")
             logging.info(f"今天的日期: {today}")
 
-            # 维护 current/latest 两份版本，并生成当日带日期的临时文件用于发送
-            current_file = domain_dir / "sitemap-current.xml"
-            latest_file = domain_dir / "sitemap-latest.xml"
+            # 维护 current/latest 两份 URL 列表，并生成当日带日期的 XML 临时文件用于发送
+            current_file, latest_file = self._stored_files(domain_dir)
             dated_file = domain_dir / f"{domain}_sitemap_{today}.xml"
 
             # 如果上次更新日期与今天相同，且相关文件已存在，则直接返回
             if last_update_file.exists():
                 # 从文件读取上次更新日期
-                last_date = last_update_file.read_text().strip()
+                last_date = (await asyncio.to_thread(last_update_file.read_text)).strip()
                 logging.info(f"上次更新日期: {last_date}")
                 if last_date == today:
                     if (
@@ -71,10 +151,8 @@ class RSSManager:
                         and current_file.exists()
                         and latest_file.exists()
                     ):
-                        current_content = current_file.read_text()
-                        latest_content = latest_file.read_text()
-                        new_urls = self.compare_sitemaps(
-                            current_content, latest_content
+                        new_urls = await asyncio.to_thread(
+                            self._diff_files, current_file, latest_file
                         )
                         return True, "今天已经更新过此sitemap, 但没发送", dated_file, new_urls
                     return (
@@ -84,35 +162,147 @@ class RSSManager:
                         [],
                     )
 
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
-            }
-            response = requests.get(url, timeout=20, headers=headers)
-            response.raise_for_status()
-
-            combined_urls = self._collect_urls_from_sitemap(response, headers=headers, depth=0)
-            combined_xml = self._build_urlset_xml(combined_urls)
-
-            new_urls = []
+            # 使用上次记录的 ETag / Last-Modified 发起条件请求，未变化时服务器返回 304
+            meta_file = domain_dir / ".http_meta.json"
+            request_headers = {}
             if current_file.exists():
-                old_content = current_file.read_text()
-                new_urls = self.compare_sitemaps(combined_xml, old_content)
-                current_file.replace(latest_file)
-
-            current_file.write_text(combined_xml)
-            dated_file.write_text(combined_xml)
-
-            last_update_file.write_text(today)
+                request_headers = await asyncio.to_thread(self._conditional_headers, meta_file, url)
+
+            async with self._get_session().get(url, headers=request_headers) as response:
+                if response.status == 304:
+                    logging.info(f"sitemap未变化(304): {url}")
+                    await asyncio.to_thread(self._promote_unchanged, current_file, latest_file, dated_file)
+                    await asyncio.to_thread(last_update_file.write_text, today)
+                    return True, "", dated_file, []
+                response.raise_for_status()
+                combined_urls, child_urls = await self._stream_locs(response)
+
+            if child_urls:
+                combined_urls.update(
+                    await self._collect_child_sitemaps(child_urls, depth=1, visited={url})
+                )
+
+            # 文件读写放到线程中执行，避免阻塞事件循环
+            new_urls = await asyncio.to_thread(
+                self._save_sitemap, current_file, latest_file, dated_file, frozenset(combined_urls)
+            )
+            await asyncio.to_thread(last_update_file.write_text, today)
+            # sitemapindex 的子 sitemap 可能独立变化，只对普通 urlset 记录校验信息
+            if child_urls:
+                await asyncio.to_thread(meta_file.unlink, missing_ok=True)
+            else:
+                await asyncio.to_thread(self._save_http_meta, meta_file, url, response)
 
             logging.info(f"sitemap已保存到: {current_file}")
             return True, "", dated_file, new_urls  # 返回新增 URL 列表
 
-        except requests.exceptions.RequestException as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             return False, f"下载失败: {str(e)}", None, []
         except Exception as e:
             return False, f"保存失败: {str(e)}", None, []
 
-    def add_feed(self, url: str) -> tuple[bool, str, Path | None, list[str]]:
+    def _save_sitemap(
+        self, current_file: Path, latest_file: Path, dated_file: Path, urls: frozenset[str]
+    ) -> list[str]:
+        """将新的 URL 集合保存为 current，原 current 轮换为 latest，返回新增的 URL 列表
+
+        先写临时文件，再依次 rename current -> latest、临时文件 -> current，中途崩溃不会留下半个文件
+        """
+        # current 只保存 URL 列表用于下次比较，XML 仅用于发送给用户的当日文件
+        text = self._urls_text(urls)
+        digest = self._content_key(text)
+        if digest == self._stored_digest(current_file):
+            # 与 current 内容完全相同，无需求差集与重写，按未变化处理
+            self._promote_unchanged(current_file, latest_file, dated_file)
+            return []
+
+        tmp_file = self._tmp_path(current_file)
+        tmp_file.write_text(text, encoding="utf-8")
+
+        # 直接用内存中的集合与旧版本求差集
+        try:
+            new_urls = list(urls - self._load_urls(current_file))
+            os.replace(current_file, latest_file)
+            # 重命名不改变修改时间，旧版本的解析结果可直接沿用
+            self._file_urls[latest_file] = self._file_urls.pop(current_file)
+        except FileNotFoundError:
+            new_urls = []
+
+        os.replace(tmp_file, current_file)
+        self._file_urls[current_file] = (current_file.stat().st_mtime_ns, urls)
+        self._save_digest(current_file, digest)
+        dated_file.write_text(self._build_urlset_xml(urls))
+        return new_urls
+
+    def _promote_unchanged(self, current_file: Path, latest_file: Path, dated_file: Path) -> None:
+        """sitemap 未变化时，以 current 覆盖 latest 并生成当日文件"""
+        # latest 与 current 内容相同，用硬链接代替复制，再原子替换 latest
+        tmp_file = self._tmp_path(latest_file)
+        tmp_file.unlink(missing_ok=True)
+        try:
+            os.link(current_file, tmp_file)
+        except OSError:
+            shutil.copyfile(current_file, tmp_file)
+        os.replace(tmp_file, latest_file)
+        # latest 已是 current 的硬链接时 rename 不生效，需清理临时文件
+        tmp_file.unlink(missing_ok=True)
+        dated_file.write_text(self._build_urlset_xml(self._load_urls(current_file)))
+
+    def _digest_path(self, path: Path) -> Path:
+        return path.with_name(path.name + ".b2")
+
+    def _stored_digest(self, path: Path) -> bytes | None:
+        """读取 path 旁保存的内容哈希；文件已被修改（修改时间不符）时视为无效"""
+        try:
+            mtime, digest = self._digest_path(path).read_text().split()
+            if int(mtime) == path.stat().st_mtime_ns:
+                return bytes.fromhex(digest)
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _save_digest(self, path: Path, digest: bytes) -> None:
+        self._digest_path(path).write_text(f"{path.stat().st_mtime_ns} {digest.hex()}")
+
+    def _tmp_path(self, path: Path) -> Path:
+        return path.with_name(path.name + ".tmp")
+
+    def _urls_text(self, urls: Set[str]) -> str:
+        return "\n".join(sorted(urls))
+
+    def _stored_files(self, domain_dir: Path) -> tuple[Path, Path]:
+        """返回某域名下保存的 (current, latest) URL 列表文件路径"""
+        return domain_dir / "sitemap-current.urls", domain_dir / "sitemap-latest.urls"
+
+    def _write_urls(self, path: Path, urls: Set[str]) -> None:
+        tmp_file = self._tmp_path(path)
+        tmp_file.write_text(self._urls_text(urls), encoding="utf-8")
+        os.replace(tmp_file, path)
+        self._file_urls[path] = (path.stat().st_mtime_ns, frozenset(urls))
+
+    def get_stored_new_urls(self, url: str) -> list[str] | None:
+        """比较已保存的 current 与 latest 版本，返回新增的 URL 列表
+
+        Returns:
+            list[str] | None: 新增的 URL 列表；current 或 latest 不存在时返回 None
+        """
+        current_file, latest_file = self._stored_files(self.sitemap_dir / urlparse(url).netloc)
+        if not (current_file.exists() and latest_file.exists()):
+            return None
+        return self._diff_files(current_file, latest_file)
+
+    def export_current_sitemap(self, url: str) -> Path | None:
+        """将已保存的 current 版本导出为 sitemap XML 文件，供命令发起者下载"""
+        domain = urlparse(url).netloc
+        domain_dir = self.sitemap_dir / domain
+        current_file, _ = self._stored_files(domain_dir)
+        if not current_file.exists():
+            return None
+        export_file = domain_dir / f"{domain}_sitemap_current.xml"
+        export_file.write_text(self._build_urlset_xml(self._load_urls(current_file)))
+        return export_file
+
+    async def add_feed(self, url: str) -> tuple[bool, str, Path | None, list[str]]:
         """添加 sitemap 监控（首次会下载当日文件）
 
         Args:
@@ -125,21 +315,23 @@ class RSSManager:
             logging.info(f"尝试添加sitemap监控: {url}")
 
             # 验证是否已存在
-            feeds = self.get_feeds()
-            if url not in feeds:
+            if url not in await self.get_feeds():
                 # 如果是新的feed，先尝试下载
-                success, error_msg, dated_file, new_urls = self.download_sitemap(url)
+                success, error_msg, dated_file, new_urls = await self.download_sitemap(url)
                 if not success:
                     return False, error_msg, None, []
 
-                # 添加到监控列表
-                feeds.append(url)
-                self.feeds_file.write_text(json.dumps(feeds, indent=2))
+                # 下载期间列表可能已被其他命令修改，加锁后重新读取再添加
+                async with self._feeds_lock:
+                    feeds = await self.get_feeds()
+                    if url not in feeds:
+                        feeds.append(url)
+                        await asyncio.to_thread(self._save_feeds, feeds)
                 logging.info(f"成功添加sitemap监控: {url}")
                 return True, "", dated_file, new_urls
             else:
                 # 已存在的 feed 也尝试下载（可能是新的一天）
-                success, error_msg, dated_file, new_urls = self.download_sitemap(url)
+                success, error_msg, dated_file, new_urls = await self.download_sitemap(url)
                 if not success:
                     return False, error_msg, None, []
                 return True, "已存在的feed更新成功", dated_file, new_urls
@@ -148,7 +340,18 @@ class RSSManager:
             logging.error(f"添加sitemap监控失败: {url}", exc_info=True)
             return False, f"添加失败: {str(e)}", None, []
 
-    def remove_feed(self, url: str) -> tuple[bool, str]:
+    async def refresh_feeds(self, urls: list[str]) -> list[tuple[bool, str, Path | None, list[str]]]:
+        """并发检查多个订阅源（同时进行的数量受限），按输入顺序返回 add_feed 的结果"""
+        semaphore = asyncio.Semaphore(FEED_CHECK_CONCURRENCY)
+
+        async def refresh(url: str) -> tuple[bool, str, Path | None, list[str]]:
+            async with semaphore:
+                logging.info(f"正在检查订阅源: {url}")
+                return await self.add_feed(url)
+
+        return await asyncio.gather(*[refresh(url) for url in urls])
+
+    async def remove_feed(self, url: str) -> tuple[bool, str]:
         """删除 RSS 订阅
 
         Args:
@@ -159,135 +362,214 @@ class RSSManager:
         """
         try:
             logging.info(f"尝试删除RSS订阅: {url}")
-            feeds = self.get_feeds()
+            async with self._feeds_lock:
+                feeds = await self.get_feeds()
 
-            if url not in feeds:
-                logging.warning(f"RSS订阅不存在: {url}")
-                return False, "该RSS订阅不存在"
+                if url not in feeds:
+                    logging.warning(f"RSS订阅不存在: {url}")
+                    return False, "该RSS订阅不存在"
 
-            feeds.remove(url)
-            logging.info(f"正在写入RSS订阅到文件: {self.feeds_file}")
-            self.feeds_file.write_text(json.dumps(feeds, indent=2))
+                feeds.remove(url)
+                logging.info(f"正在写入RSS订阅到文件: {self.feeds_file}")
+                await asyncio.to_thread(self._save_feeds, feeds)
             logging.info(f"成功删除RSS订阅: {url}")
             return True, ""
         except Exception as e:
             logging.error(f"删除RSS订阅失败: {url}", exc_info=True)
             return False, f"删除失败: {str(e)}"
 
-    def get_feeds(self) -> list:
+    async def get_feeds(self) -> list:
         """获取所有监控的订阅源列表"""
         try:
-            content = self.feeds_file.read_text()
-            return json.loads(content)
+            mtime = self.feeds_file.stat().st_mtime_ns
+            if mtime != self._feeds_mtime:
+                self._feeds_cache = orjson.loads(await asyncio.to_thread(self.feeds_file.read_bytes))
+                self._feeds_mtime = mtime
+            # 返回副本，调用方修改列表不会影响缓存
+            return list(self._feeds_cache)
         except Exception as e:
             logging.error("读取feeds文件失败", exc_info=True)
             return []
 
-    def compare_sitemaps(self, current_content: str, old_content: str) -> list[str]:
-        """比较新旧 sitemap，返回新增的 URL 列表
-
-        采用官方 sitemap 命名空间解析 URL 列表，取差集获得新增项
-        """
-        try:
-            current_urls = self._extract_all_urls(current_content)
-            old_urls = self._extract_all_urls(old_content)
-            return list(current_urls - old_urls)
-        except Exception as e:
-            logging.error(f"比较sitemap失败: {str(e)}")
-            return []
+    def _save_feeds(self, feeds: list) -> None:
+        """写入订阅列表并同步内存缓存"""
+        self.feeds_file.write_bytes(orjson.dumps(feeds, option=orjson.OPT_INDENT_2))
+        self._feeds_cache = list(feeds)
+        self._feeds_mtime = self.feeds_file.stat().st_mtime_ns
 
     def _build_urlset_xml(self, urls: Set[str]) -> str:
-        ns = "http://www.sitemaps.org/schemas/sitemap/0.9"
         items = []
         for u in sorted(urls):
-            items.append(f"<url><loc>{u}</loc></url>")
-        return f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{ns}">\n' + "\n".join(items) + "\n</urlset>"
+            items.append(f"<url><loc>{escape(u)}</loc></url>")
+        return f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n' + "\n".join(items) + "\n</urlset>"
 
-    def _is_gzip_response(self, resp: requests.Response, url: str) -> bool:
-        ct = (resp.headers.get("Content-Type") or "").lower()
-        ce = (resp.headers.get("Content-Encoding") or "").lower()
-        return url.lower().endswith(".gz") or "gzip" in ce or "application/gzip" in ct or "application/x-gzip" in ct
-
-    def _response_to_text(self, resp: requests.Response, url: str) -> str:
+    def _conditional_headers(self, meta_file: Path, url: str) -> dict:
+        """根据上次保存的 ETag / Last-Modified 构造条件请求头"""
         try:
-            if self._is_gzip_response(resp, url):
-                raw = resp.content
-                try:
-                    data = gzip.decompress(raw)
-                except OSError:
-                    data = raw
-                try:
-                    return data.decode("utf-8")
-                except UnicodeDecodeError:
-                    return data.decode("latin-1", errors="ignore")
-            else:
-                if resp.encoding:
-                    return resp.text
-                return resp.content.decode("utf-8", errors="ignore")
+            meta = orjson.loads(meta_file.read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            return {}
+        if meta.get("url") != url:
+            return {}
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def _save_http_meta(self, meta_file: Path, url: str, resp: aiohttp.ClientResponse) -> None:
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            meta_file.unlink(missing_ok=True)
+            return
+        meta_file.write_bytes(orjson.dumps({"url": url, "etag": etag, "last_modified": last_modified}, option=orjson.OPT_INDENT_2))
+
+    async def _fetch_and_parse(self, url: str, depth: int, visited: set[str]) -> Set[str]:
+        """下载子 sitemap 并解析其中的 URL，失败时返回空集合"""
+        try:
+            # 只在请求期间占用并发名额，解析与递归抓取时释放，避免嵌套层级互相等待
+            async with self._fetch_semaphore:
+                async with self._get_session().get(url) as resp:
+                    resp.raise_for_status()
+                    urls, child_urls = await self._stream_locs(resp)
+            if child_urls:
+                urls.update(await self._collect_child_sitemaps(child_urls, depth=depth + 1, visited=visited))
+            return urls
         except Exception:
-            return resp.text
+            logging.warning(f"子 sitemap 获取失败: {url}")
+            return set()
 
-    def _collect_urls_from_sitemap(self, resp: requests.Response, headers: dict, depth: int) -> Set[str]:
-        from xml.etree import ElementTree as ET
-        txt = self._response_to_text(resp, resp.url)
+    async def _collect_child_sitemaps(self, child_urls: list[str], depth: int, visited: set[str]) -> Set[str]:
+        """并发抓取子 sitemap，跳过已抓取过的地址，并限制总数量"""
         urls: Set[str] = set()
-        try:
-            root = ET.fromstring(txt)
-        except Exception:
-            return urls
-        tag = root.tag.lower()
-        if tag.endswith("urlset"):
-            for loc in root.findall(".//{http://www.sitemaps.org/schemas/sitemap/0.9}loc"):
-                if loc.text:
-                    urls.add(loc.text.strip())
-            if not urls:
-                for loc in root.findall(".//loc"):
-                    if loc.text:
-                        urls.add(loc.text.strip())
-            return urls
-        if tag.endswith("sitemapindex"):
-            if depth > 3:
-                return urls
-            for node in root.findall(".//{http://www.sitemaps.org/schemas/sitemap/0.9}sitemap/{http://www.sitemaps.org/schemas/sitemap/0.9}loc"):
-                if node.text:
-                    child_url = node.text.strip()
-                    try:
-                        child_resp = requests.get(child_url, timeout=20, headers=headers)
-                        child_resp.raise_for_status()
-                        child_urls = self._collect_urls_from_sitemap(child_resp, headers=headers, depth=depth + 1)
-                        urls.update(child_urls)
-                    except Exception:
-                        logging.warning(f"子 sitemap 获取失败: {child_url}")
-            if not urls:
-                for node in root.findall(".//sitemap/loc"):
-                    if node.text:
-                        child_url = node.text.strip()
-                        try:
-                            child_resp = requests.get(child_url, timeout=20, headers=headers)
-                            child_resp.raise_for_status()
-                            child_urls = self._collect_urls_from_sitemap(child_resp, headers=headers, depth=depth + 1)
-                            urls.update(child_urls)
-                        except Exception:
-                            logging.warning(f"子 sitemap 获取失败: {child_url}")
+        if depth > MAX_SITEMAP_DEPTH:
             return urls
+        pending = []
+        for child_url in dict.fromkeys(child_urls):
+            if child_url in visited:
+                continue
+            if len(visited) > MAX_CHILD_SITEMAPS:
+                logging.warning(f"子 sitemap 数量超过上限 {MAX_CHILD_SITEMAPS}，其余已忽略")
+                break
+            visited.add(child_url)
+            pending.append(child_url)
+        # 并发抓取所有子 sitemap，耗时取决于最慢的一个而非总和
+        results = await asyncio.gather(*[self._fetch_and_parse(u, depth, visited) for u in pending])
+        for child in results:
+            urls.update(child)
         return urls
 
-    def _extract_all_urls(self, xml_text: str) -> Set[str]:
-        from xml.etree import ElementTree as ET
+    async def _stream_locs(self, resp: aiohttp.ClientResponse) -> tuple[Set[str], list[str]]:
+        """边下载边解析响应体，将 loc 分为页面 URL 与子 sitemap URL 两组
+
+        gzip 压缩的 sitemap（按魔数识别）同样流式解压，内存占用不随文件大小增长；
+        Content-Encoding: gzip 已由 aiohttp 解压
+        """
         urls: Set[str] = set()
+        child_urls: list[str] = []
+        parser = etree.XMLPullParser(events=("end",), tag=LOC_TAGS, recover=True, resolve_entities=False)
+        decompressor = None
+        head: bytes | None = b""  # 识别 gzip 魔数前暂存的开头字节
+
+        def feed(data: bytes) -> None:
+            parser.feed(data)
+            for is_child_sitemap, loc in self._locs_from_events(parser.read_events()):
+                if is_child_sitemap:
+                    child_urls.append(loc)
+                else:
+                    urls.add(loc)
+
+        def inflate(data: bytes) -> bytes:
+            nonlocal decompressor
+            out = decompressor.decompress(data)
+            # 多个 gzip 成员首尾相接时，上一个成员结束后的剩余字节交给新的解压器继续处理
+            while decompressor.eof:
+                rest = decompressor.unused_data.lstrip(b"\x00")  # 文件末尾可能填充 0 字节
+                if not rest:
+                    break
+                decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+                out += decompressor.decompress(rest)
+            return out
+
         try:
-            root = ET.fromstring(xml_text)
-        except Exception:
-            return urls
-        tag = root.tag.lower()
-        if tag.endswith("urlset"):
-            for loc in root.findall(".//{http://www.sitemaps.org/schemas/sitemap/0.9}loc"):
-                if loc.text:
-                    urls.add(loc.text.strip())
-            if not urls:
-                for loc in root.findall(".//loc"):
-                    if loc.text:
-                        urls.add(loc.text.strip())
-        elif tag.endswith("sitemapindex"):
-            urls = set()
+            async for chunk in resp.content.iter_chunked(STREAM_CHUNK_SIZE):
+                if head is not None:
+                    head += chunk
+                    if len(head) < len(GZIP_MAGIC):
+                        continue
+                    if head.startswith(GZIP_MAGIC):
+                        decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+                    chunk, head = head, None
+                if decompressor:
+                    chunk = inflate(chunk)
+                feed(chunk)
+            if head:
+                feed(head)
+            if decompressor:
+                feed(decompressor.flush())
+                if not decompressor.eof:
+                    raise zlib.error("gzip 数据不完整")
+            parser.close()
+        except etree.XMLSyntaxError:
+            pass
+        except zlib.error as e:
+            # 压缩数据损坏或被截断，按下载失败处理，避免以残缺的 URL 集合覆盖 current
+            raise aiohttp.ClientPayloadError(f"gzip 解压失败: {e}") from e
+        return urls, child_urls
+
+    def _iter_locs(self, data: bytes) -> Iterator[tuple[bool, str]]:
+        """流式解析 sitemap，逐个产出 (是否为子 sitemap, loc 文本)"""
+        context = etree.iterparse(
+            BytesIO(data),
+            events=("end",),
+            tag=LOC_TAGS,
+            recover=True,
+            resolve_entities=False,
+        )
+        try:
+            yield from self._locs_from_events(context)
+        except etree.XMLSyntaxError:
+            return
+
+    def _locs_from_events(self, events: Iterable[tuple[str, etree._Element]]) -> Iterator[tuple[bool, str]]:
+        """从 loc 元素的解析事件中产出 (是否为子 sitemap, loc 文本)
+
+        已处理的节点随即释放，内存占用不随文件大小增长
+        """
+        for _, el in events:
+            parent = el.getparent()
+            text = el.text.strip() if el.text else ""
+            if text and parent is not None:
+                yield parent.tag in SITEMAP_TAGS, text
+            el.clear()
+            # parent 为根节点时没有上级，其前面的兄弟只会是顶层注释或处理指令，无需释放
+            grandparent = parent.getparent() if parent is not None else None
+            if grandparent is not None:
+                while parent.getprevious() is not None:
+                    del grandparent[0]
+
+    def _extract_all_urls(self, xml: str | bytes) -> Set[str]:
+        if isinstance(xml, str):
+            xml = xml.encode("utf-8")
+        return {loc for is_child_sitemap, loc in self._iter_locs(xml) if not is_child_sitemap}
+
+    def _content_key(self, xml: str | bytes) -> bytes:
+        if isinstance(xml, str):
+            xml = xml.encode("utf-8")
+        return hashlib.blake2b(xml, digest_size=16).digest()
+
+    def _load_urls(self, path: Path) -> frozenset[str]:
+        """读取已保存的 URL 列表文件，文件未修改时直接复用上次的结果"""
+        mtime = path.stat().st_mtime_ns
+        cached = self._file_urls.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        urls = frozenset(path.read_text(encoding="utf-8").splitlines())
+        self._file_urls[path] = (mtime, urls)
         return urls
+
+    def _diff_files(self, current_file: Path, latest_file: Path) -> list[str]:
+        """比较已保存的 current 与 latest 文件，返回新增的 URL 列表"""
+        return list(self._load_urls(current_file) - self._load_urls(latest_file))
@@ -10,6 +10,7 @@ import asyncio
 
 from apps import telegram_bot, discord_bot
 from core.config import discord_config, telegram_config
+from services.rss.manager import RSSManager
 
 
 def main():
@@ -61,7 +62,8 @@ def main():
         logging.info("Ctrl-C close!!")
         telegram_bot.close_all()
     finally:
-        # 关闭事件循环释放资源
+        # 关闭共享的 HTTP 会话与事件循环释放资源
+        loop.run_until_complete(RSSManager.close())
         loop.close()
 
 